@@ -1,28 +1,46 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import heapq
+from dataclasses import asdict, dataclass
+from html import escape
 import json
-from typing import List, Dict
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from importlib.util import find_spec
+from itertools import islice
+from types import MappingProxyType
+from typing import List, Dict, Optional, Sequence
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-# Plotly imports
+# Optional streaming JSON parser
 try:
-    import plotly.graph_objects as go
-    import plotly.express as px
-    PLOTLY_AVAILABLE = True
+    import ijson
+    IJSON_AVAILABLE = True
 except ImportError:
-    PLOTLY_AVAILABLE = False
+    IJSON_AVAILABLE = False
 
-# Page Configuration
-st.set_page_config(
-    page_title="Helix Insights - Competitive Intelligence",
-    page_icon="🧬",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# Optional fast JSON parser/encoder for API responses and report export
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-# Custom CSS for Helix Insights Brand
-st.markdown("""
+# Parquet export needs a pandas parquet engine
+PARQUET_AVAILABLE = find_spec('pyarrow') is not None or find_spec('fastparquet') is not None
+
+# Plotly is only imported once a chart is drawn, keeping it out of the first page load
+PLOTLY_AVAILABLE = find_spec('plotly') is not None
+
+# Static brand markup - Streamlit re-sends it on every rerun, so the CSS ships whitespace-collapsed
+BRAND_CSS = re.sub(r'\s+', ' ', """
 <style>
     /* Brand Colors: Deep Navy (#1a2332), Teal (#00b4d8), Sky Blue (#90e0ef) */
     .main {
@@ -70,66 +88,131 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+""").strip()
+
+FOOTER_HTML = """
+    <div style='text-align: center; color: #6b7280; padding: 2rem;'>
+        <strong>Helix Insights</strong> • Transforming competitive intelligence from hours to seconds<br>
+        Built with Madison AI Framework • Data sources: FDA 510(k) & ClinicalTrials.gov<br>
+        <a href='https://helix-insights.vercel.app' target='_blank'>Learn More →</a>
+    </div>
+    """
+
+# Page Configuration
+st.set_page_config(
+    page_title="Helix Insights - Competitive Intelligence",
+    page_icon="🧬",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Custom CSS for Helix Insights Brand
+st.markdown(BRAND_CSS, unsafe_allow_html=True)
+
+# Madison Intelligence Agent - Keyword Terms (built once at import)
+OPHTHALMIC_TERMS = frozenset({
+    'contact lens', 'intraocular', 'iol', 'lens',
+    'ophthalmic', 'vision', 'eye', 'retina', 'cornea',
+    'cataract', 'glaucoma', 'myopia', 'surgical',
+    'vitreous', 'retinal', 'ocular', 'subretinal', 'aspirator'
+})
+
+ADVANCED_TERMS = frozenset({'surgical', 'implant', 'laser', 'aspirator', 'injector', 'advanced'})
+
+ADVANCED_PHASES = frozenset({'phase 3', 'phase iii', 'phase 2', 'phase ii'})
+
+MAJOR_COMPETITORS = frozenset({
+    'alcon', 'bausch', 'coopervision', 'zeiss', 'johnson',
+    'novartis', 'essilor', 'hoya', 'menicon', 'paragon',
+    'optical', 'vision', 'staar', 'amo',
+    # Run-together spellings of the names above - competitors are matched as whole tokens
+    'bauschlomb', 'essilorluxottica', 'visioncare', 'zeissvision'
+})
+
+def compile_terms(terms, whole_words: bool = False) -> re.Pattern:
+    """Compile a term set into one alternation so a factor is a single regex scan"""
+    # Sorted so the pattern is the same on every run regardless of set iteration order
+    alternation = '|'.join(map(re.escape, sorted(terms)))
+    if whole_words:
+        # Terms must be whole [a-z]+ tokens of the lowercased text, e.g. 'vision' no longer hits 'visionary'
+        return re.compile(f'(?<![a-z])(?:{alternation})(?![a-z])')
+    return re.compile(alternation)
+
+OPHTHALMIC_PATTERN = compile_terms(OPHTHALMIC_TERMS)
+ADVANCED_PATTERN = compile_terms(ADVANCED_TERMS)
+ADVANCED_PHASE_PATTERN = compile_terms(ADVANCED_PHASES)
+COMPETITOR_PATTERN = compile_terms(MAJOR_COMPETITORS, whole_words=True)
+
+# Closing action shared by every record's action list - treat as read-only
+QUARTERLY_REVIEW_ACTION = {
+    'priority': 'LOW',
+    'action': 'Include in quarterly competitive review',
+    'timeline': 'Quarterly',
+    'owner': 'Strategic Planning'
+}
+LOW_PRIORITY_ACTIONS = (QUARTERLY_REVIEW_ACTION,)
+
+# Madison Intelligence Agent - Per-record result (field names double as the report's JSON keys)
+@dataclass(slots=True)
+class Intelligence:
+    threatScore: int
+    threatLevel: str
+    confidence: int
+    strategicImplications: List[str]
+    actionItems: Sequence[Dict]
+    analysisTimestamp: str
+    agentVersion: str
 
 # Madison Intelligence Agent - Core Logic
 class MadisonIntelligenceAgent:
     
     @staticmethod
-    def is_date_recent(date_string: str, days_threshold: int) -> bool:
-        """Check if date is within threshold"""
-        if not date_string or date_string == 'N/A':
-            return False
+    def days_since(date_string: str, today: date) -> Optional[int]:
+        """Whole days from a YYYY-MM-DD date to today - None when the date is missing or malformed"""
+        # Only plain YYYY-MM-DD dates count ('N/A', partial '2024-06' dates are skipped)
+        if not date_string or len(date_string) != 10:
+            return None
         try:
-            date = datetime.strptime(date_string, '%Y-%m-%d')
-            now = datetime.now()
-            diff_days = (now - date).days
-            return 0 <= diff_days <= days_threshold
-        except:
-            return False
+            return today.toordinal() - date.fromisoformat(date_string).toordinal()
+        except ValueError:
+            return None
     
     @staticmethod
-    def analyze_record(record: Dict) -> Dict:
+    def analyze_record(record: Dict, now: datetime = None, now_iso: str = None) -> Intelligence:
         """Madison AI threat analysis - exact logic from n8n"""
+        now = now or datetime.now()
+        source = record.get('source', '')
+        company = (record.get('company', '') or '').lower()
+        device_name = record.get('deviceName', '') or ''
+        trial_title = record.get('trialTitle', '') or ''
+        decision_date = record.get('decisionDate') or record.get('startDate', '')
+        # Lowercase the combined text once rather than each field separately
+        search_text = f"{device_name} {trial_title} {record.get('productCode', '') or ''}".lower()
+        
         threat_score = 0
         threat_level = 'LOW'
         strategic_implications = []
         confidence = 0
         
-        source = record.get('source', '')
-        company = (record.get('company', '') or '').lower()
-        device_name = (record.get('deviceName', '') or '').lower()
-        trial_title = (record.get('trialTitle', '') or '').lower()
-        decision_date = record.get('decisionDate') or record.get('startDate', '')
-        product_code = (record.get('productCode', '') or '').lower()
-        
-        # Factor 1: Recent Activity
-        if MadisonIntelligenceAgent.is_date_recent(decision_date, 730):
+        # Factor 1: Recent Activity - the date is parsed once for both windows
+        days_ago = MadisonIntelligenceAgent.days_since(decision_date, now.date())
+        if days_ago is not None and 0 <= days_ago <= 730:
             threat_score += 35
             confidence += 25
             strategic_implications.append('Recent approval/trial within last 2 years')
-        elif MadisonIntelligenceAgent.is_date_recent(decision_date, 1825):
+        elif days_ago is not None and 0 <= days_ago <= 1825:
             threat_score += 20
             confidence += 15
             strategic_implications.append('Activity within last 5 years')
         
         # Factor 2: Ophthalmology Categories
-        ophthalmic_terms = [
-            'contact lens', 'intraocular', 'iol', 'lens', 
-            'ophthalmic', 'vision', 'eye', 'retina', 'cornea',
-            'cataract', 'glaucoma', 'myopia', 'surgical',
-            'vitreous', 'retinal', 'ocular', 'subretinal', 'aspirator'
-        ]
-        
-        search_text = f"{device_name} {trial_title} {product_code}"
-        if any(term in search_text for term in ophthalmic_terms):
+        if OPHTHALMIC_PATTERN.search(search_text):
             threat_score += 30
             confidence += 20
             strategic_implications.append('High-value ophthalmology product category')
         
         # Factor 3: Advanced/Surgical Devices
-        advanced_terms = ['surgical', 'implant', 'laser', 'aspirator', 'injector', 'advanced']
-        if any(term in search_text for term in advanced_terms):
+        if ADVANCED_PATTERN.search(search_text):
             threat_score += 25
             confidence += 15
             strategic_implications.append('Advanced surgical or premium device')
@@ -146,20 +229,13 @@ class MadisonIntelligenceAgent:
             confidence += 10
             strategic_implications.append('Active clinical development')
             
-            advanced_phases = ['phase 3', 'phase iii', 'phase 2', 'phase ii']
-            if any(phase in trial_title for phase in advanced_phases):
+            if ADVANCED_PHASE_PATTERN.search(trial_title.lower()):
                 threat_score += 30
                 confidence += 20
                 strategic_implications.append('Advanced clinical phase')
         
         # Factor 6: Major Competitors
-        major_competitors = [
-            'alcon', 'bausch', 'coopervision', 'zeiss', 'johnson',
-            'novartis', 'essilor', 'hoya', 'menicon', 'paragon',
-            'optical', 'vision', 'staar', 'amo'
-        ]
-        
-        if any(comp in company for comp in major_competitors):
+        if COMPETITOR_PATTERN.search(company):
             threat_score += 25
             confidence += 20
             strategic_implications.append('Established ophthalmology competitor')
@@ -182,22 +258,33 @@ class MadisonIntelligenceAgent:
         
         # Generate Action Items
         action_items = MadisonIntelligenceAgent.generate_action_items(
-            threat_level, company, device_name or trial_title
+            threat_level, company, (device_name or trial_title).lower()
         )
         
-        return {
-            'threatScore': threat_score,
-            'threatLevel': threat_level,
-            'confidence': confidence,
-            'strategicImplications': strategic_implications,
-            'actionItems': action_items,
-            'analysisTimestamp': datetime.now().isoformat(),
-            'agentVersion': 'Madison_Intelligence_v1.3'
-        }
+        return Intelligence(
+            threatScore=threat_score,
+            threatLevel=threat_level,
+            confidence=confidence,
+            strategicImplications=strategic_implications,
+            actionItems=action_items,
+            analysisTimestamp=now_iso or now.isoformat(),
+            agentVersion='Madison_Intelligence_v1.3'
+        )
     
     @staticmethod
-    def generate_action_items(threat_level: str, company: str, device: str) -> List[Dict]:
+    def analyze_batch(records: List[Dict], now: datetime = None) -> List[Intelligence]:
+        """analyze_record over all records against a single clock reading"""
+        now = now or datetime.now()
+        now_iso = now.isoformat()
+        return [MadisonIntelligenceAgent.analyze_record(record, now, now_iso) for record in records]
+    
+    @staticmethod
+    def generate_action_items(threat_level: str, company: str, device: str) -> Sequence[Dict]:
         """Generate actionable recommendations"""
+        # LOW threats (the bulk of most runs) only get the quarterly review
+        if threat_level == 'LOW':
+            return LOW_PRIORITY_ACTIONS
+        
         actions = []
         company_name = company or 'Competitor'
         device_name = device or 'device'
@@ -226,12 +313,7 @@ class MadisonIntelligenceAgent:
                 'owner': 'Market Intelligence'
             })
         
-        actions.append({
-            'priority': 'LOW',
-            'action': 'Include in quarterly competitive review',
-            'timeline': 'Quarterly',
-            'owner': 'Strategic Planning'
-        })
+        actions.append(QUARTERLY_REVIEW_ACTION)
         
         return actions
 
@@ -319,8 +401,91 @@ def generate_demo_data() -> List[Dict]:
     return demo_fda + demo_trials
 
 # Data Fetching Functions
-def fetch_fda_data(search_term: str, days_back: int = 365, api_key: str = None) -> List[Dict]:
-    """Fetch FDA 510(k) data with improved error handling"""
+FDA_PAGE_SIZE = 100  # Records per request when a larger FDA pull is paged in parallel
+FDA_MAX_LIMIT = 1000  # openFDA's largest accepted limit per request
+EMPTY_SECTION = MappingProxyType({})  # Shared read-only default for missing nested JSON sections
+
+def fda_page_size(api_key: Optional[str]) -> int:
+    """Records per FDA request for this key - sizes both the paging and the fetch pool"""
+    # Keyed pulls split into FDA_PAGE_SIZE pages fetched in parallel; anonymous pulls stay
+    # one request where possible since each page counts against the much smaller keyless quota
+    return FDA_PAGE_SIZE if api_key and api_key.strip() else FDA_MAX_LIMIT
+
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> requests.Session:
+    """Process-wide HTTP session - pooled keep-alive connections survive Streamlit reruns"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        # Transient gateway errors are retried with backoff; once retries run out the last
+        # response is returned so raise_for_status still reports its status code
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False)
+    ))
+    return session
+
+def script_thread_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Thread pool whose workers can call st.* for the current script run"""
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    )
+
+def iter_json_items(response: requests.Response, key: str):
+    """Iterate a top-level JSON array - orjson parses the whole body fastest, ijson streams it incrementally"""
+    if ORJSON_AVAILABLE:
+        return iter(orjson.loads(response.content).get(key, []))
+    if IJSON_AVAILABLE:
+        response.raw.decode_content = True
+        return ijson.items(response.raw, f'{key}.item')
+    return iter(response.json().get(key, []))
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def query_fda(search_query: str, api_key: str = None, limit: int = 50, skip: int = 0) -> List[Dict]:
+    """Cached FDA 510(k) request - raises on API errors so failures are never cached"""
+    url = "https://api.fda.gov/device/510k.json"
+    
+    params = {
+        'search': search_query,
+        'limit': limit,
+        'skip': skip
+    }
+    
+    # Add API key if provided
+    if api_key:
+        params['api_key'] = api_key
+    
+    # Make request - requests library will properly encode the URL
+    with get_http_session().get(url, params=params, timeout=30, stream=True) as response:
+        if response.status_code == 404:
+            # No results found for this query
+            return []
+        response.raise_for_status()
+        
+        results = []
+        
+        for item in iter_json_items(response, 'results'):
+            # Format decision date properly
+            decision_date = item.get('decision_date', '')
+            if decision_date and len(decision_date) == 8:  # Format: YYYYMMDD
+                decision_date = f"{decision_date[:4]}-{decision_date[4:6]}-{decision_date[6:]}"
+            
+            results.append({
+                'source': 'FDA 510(k)',
+                'company': item.get('applicant', 'Unknown'),
+                'deviceName': item.get('device_name', 'Unknown Device'),
+                'productCode': item.get('product_code', ''),
+                'decisionDate': decision_date or 'N/A',
+                'status': 'Approved',
+                'regulatoryClass': item.get('device_class', 'Unknown')
+            })
+        
+        return results
+
+def fetch_fda_data(search_term: str, days_back: int = 365, api_key: str = None, limit: int = 50,
+                   executor: ThreadPoolExecutor = None) -> List[Dict]:
+    """Fetch FDA 510(k) data with improved error handling - pages run on executor when given"""
     try:
         # Calculate dates
         date_to = datetime.now()
@@ -330,68 +495,85 @@ def fetch_fda_data(search_term: str, days_back: int = 365, api_key: str = None)
         date_from_str = date_from.strftime('%Y%m%d')
         date_to_str = date_to.strftime('%Y%m%d')
         
-        url = "https://api.fda.gov/device/510k.json"
-        
         # Build search query - let requests handle the encoding
         search_query = f'decision_date:[{date_from_str} TO {date_to_str}]'
         
-        params = {
-            'search': search_query,
-            'limit': 50  # Increased for better coverage
-        }
-        
-        # Add API key if provided
-        if api_key and api_key.strip():
-            params['api_key'] = api_key.strip()
-        
-        # Make request - requests library will properly encode the URL
-        response = requests.get(url, params=params, timeout=30)
-        
-        # Check response
-        if response.status_code == 200:
-            data = response.json()
-            results = []
-            
-            for item in data.get('results', []):
-                # Format decision date properly
-                decision_date = item.get('decision_date', '')
-                if decision_date and len(decision_date) == 8:  # Format: YYYYMMDD
-                    decision_date = f"{decision_date[:4]}-{decision_date[4:6]}-{decision_date[6:]}"
-                
-                results.append({
-                    'source': 'FDA 510(k)',
-                    'company': item.get('applicant', 'Unknown'),
-                    'deviceName': item.get('device_name', 'Unknown Device'),
-                    'productCode': item.get('product_code', ''),
-                    'decisionDate': decision_date or 'N/A',
-                    'status': 'Approved',
-                    'regulatoryClass': item.get('device_class', 'Unknown')
-                })
-            
-            return results
-        elif response.status_code == 404:
-            # No results found for this query
-            return []
-        else:
-            # API error
-            error_msg = f"FDA API status {response.status_code}"
-            if response.status_code >= 500:
-                error_msg += " (server issue - temporary)"
-            st.warning(f"{error_msg}. Using clinical trials data. {'Try demo data for full functionality.' if not api_key else 'FDA servers may be experiencing issues.'}")
-            return []
-            
-    except requests.exceptions.Timeout:
+        api_key = api_key.strip() if api_key and api_key.strip() else None
+        
+        page_size = fda_page_size(api_key)
+        pages = [(skip, min(page_size, limit - skip)) for skip in range(0, limit, page_size)]
+        if len(pages) == 1:
+            return query_fda(search_query, api_key, limit)
+        
+        with nullcontext(executor) if executor else script_thread_pool(max_workers=len(pages)) as pool:
+            futures = [
+                pool.submit(query_fda, search_query, api_key, page_limit, skip)
+                for skip, page_limit in pages
+            ]
+            return [record for future in futures for record in future.result()]
+        
+    except requests.exceptions.HTTPError as e:
+        # API error
+        status_code = e.response.status_code
+        error_msg = f"FDA API status {status_code}"
+        if status_code >= 500:
+            error_msg += " (server issue - temporary)"
+        st.warning(f"{error_msg}. Using clinical trials data. {'Try demo data for full functionality.' if not api_key else 'FDA servers may be experiencing issues.'}")
+        return []
+    except (requests.exceptions.Timeout, ReadTimeoutError):
+        # ijson reads response.raw directly, so a stalled stream raises urllib3's timeout unwrapped
         st.warning("FDA API timeout - their servers may be slow. Continuing with clinical trials data.")
         return []
     except Exception as e:
         st.warning(f"FDA API unavailable: {str(e)}. Continuing with clinical trials data.")
         return []
 
-def fetch_clinical_trials(search_term: str, days_back: int = 365) -> List[Dict]:
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def query_clinical_trials(query: str, page_size: int = 50) -> List[Dict]:
+    """Cached ClinicalTrials.gov request - raises on API errors so failures are never cached"""
+    url = "https://clinicaltrials.gov/api/v2/studies"
+    
+    params = {
+        'query.term': query,
+        'filter.overallStatus': 'RECRUITING,ACTIVE_NOT_RECRUITING,COMPLETED',
+        'pageSize': page_size,
+        'format': 'json'
+    }
+    
+    with get_http_session().get(url, params=params, timeout=15, stream=True) as response:
+        response.raise_for_status()
+        
+        results = []
+        
+        for study in islice(iter_json_items(response, 'studies'), page_size):
+            protocol = study.get('protocolSection', EMPTY_SECTION)
+            identification = protocol.get('identificationModule', EMPTY_SECTION)
+            status_module = protocol.get('statusModule', EMPTY_SECTION)
+            sponsor_module = protocol.get('sponsorCollaboratorsModule', EMPTY_SECTION)
+            design_module = protocol.get('designModule', EMPTY_SECTION)
+            
+            # Format start date
+            start_date = status_module.get('startDateStruct', EMPTY_SECTION).get('date', 'N/A')
+            
+            # Get phase
+            phases = design_module.get('phases', ())
+            phase = phases[0] if phases else 'Unknown'
+            
+            results.append({
+                'source': 'ClinicalTrials.gov',
+                'company': sponsor_module.get('leadSponsor', EMPTY_SECTION).get('name', 'Unknown'),
+                'trialTitle': identification.get('briefTitle', 'Unknown Trial'),
+                'nctId': identification.get('nctId', ''),
+                'status': status_module.get('overallStatus', 'Unknown'),
+                'startDate': start_date,
+                'phase': phase
+            })
+        
+        return results
+
+def fetch_clinical_trials(search_term: str, days_back: int = 365, limit: int = 50) -> List[Dict]:
     """Fetch ClinicalTrials.gov data"""
     try:
-        url = "https://clinicaltrials.gov/api/v2/studies"
-        
         # Build query
         query_parts = ["AREA[StudyType]Interventional"]
         
@@ -400,47 +582,13 @@ def fetch_clinical_trials(search_term: str, days_back: int = 365) -> List[Dict]:
         
         query = " AND ".join(query_parts)
         
-        params = {
-            'query.term': query,
-            'filter.overallStatus': 'RECRUITING,ACTIVE_NOT_RECRUITING,COMPLETED',
-            'pageSize': 50,
-            'format': 'json'
-        }
-        
-        response = requests.get(url, params=params, timeout=15)
-        
-        if response.status_code == 200:
-            data = response.json()
-            results = []
-            
-            for study in data.get('studies', [])[:50]:  # Limit to first 50
-                protocol = study.get('protocolSection', {})
-                identification = protocol.get('identificationModule', {})
-                status_module = protocol.get('statusModule', {})
-                sponsor_module = protocol.get('sponsorCollaboratorsModule', {})
-                design_module = protocol.get('designModule', {})
-                
-                # Format start date
-                start_date = status_module.get('startDateStruct', {}).get('date', 'N/A')
-                
-                # Get phase
-                phases = design_module.get('phases', [])
-                phase = phases[0] if phases else 'Unknown'
-                
-                results.append({
-                    'source': 'ClinicalTrials.gov',
-                    'company': sponsor_module.get('leadSponsor', {}).get('name', 'Unknown'),
-                    'trialTitle': identification.get('briefTitle', 'Unknown Trial'),
-                    'nctId': identification.get('nctId', ''),
-                    'status': status_module.get('overallStatus', 'Unknown'),
-                    'startDate': start_date,
-                    'phase': phase
-                })
-            
-            return results
-        else:
-            st.warning(f"ClinicalTrials API returned status {response.status_code}")
-            return []
+        return query_clinical_trials(query, limit)
+    except requests.exceptions.HTTPError as e:
+        st.warning(f"ClinicalTrials API returned status {e.response.status_code}")
+        return []
+    except (requests.exceptions.Timeout, ReadTimeoutError):
+        st.warning("ClinicalTrials API timeout - their servers may be slow. Continuing with FDA data.")
+        return []
     except Exception as e:
         st.warning(f"ClinicalTrials API temporarily unavailable: {str(e)}")
         return []
@@ -448,33 +596,43 @@ def fetch_clinical_trials(search_term: str, days_back: int = 365) -> List[Dict]:
 def generate_executive_summary(analyzed_records: List[Dict]) -> Dict:
     """Generate executive summary from analyzed records"""
     threat_counts = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
-    critical_threats = []
-    high_threats = []
+    critical_records = []
+    high_records = []
     total_confidence = 0
     
+    # Single pass for counts and confidence; detail dicts are only built for the top 5 below
     for record in analyzed_records:
         intel = record['madisonIntelligence']
-        threat_counts[intel['threatLevel']] += 1
-        total_confidence += intel['confidence']
-        
-        if intel['threatLevel'] == 'CRITICAL':
-            critical_threats.append({
-                'company': record.get('company', 'Unknown'),
-                'product': (record.get('deviceName') or record.get('trialTitle', 'Unknown'))[:100],
-                'threatScore': intel['threatScore'],
-                'confidence': intel['confidence'],
-                'urgentAction': intel['actionItems'][0]['action'] if intel['actionItems'] else 'Review immediately'
-            })
-        elif intel['threatLevel'] == 'HIGH':
-            high_threats.append({
-                'company': record.get('company', 'Unknown'),
-                'product': (record.get('deviceName') or record.get('trialTitle', 'Unknown'))[:100],
-                'threatScore': intel['threatScore'],
-                'confidence': intel['confidence']
-            })
+        threat_level = intel.threatLevel
+        threat_counts[threat_level] += 1
+        total_confidence += intel.confidence
+        
+        if threat_level == 'CRITICAL':
+            critical_records.append(record)
+        elif threat_level == 'HIGH':
+            high_records.append(record)
+    
+    def threat_detail(record: Dict) -> Dict:
+        intel = record['madisonIntelligence']
+        return {
+            # API fields can be null, and the alerts escape these as strings
+            'company': record.get('company') or 'Unknown',
+            'product': (record.get('deviceName') or record.get('trialTitle') or 'Unknown')[:100],
+            'threatScore': intel.threatScore,
+            'confidence': intel.confidence
+        }
     
-    critical_threats.sort(key=lambda x: x['threatScore'], reverse=True)
-    high_threats.sort(key=lambda x: x['threatScore'], reverse=True)
+    by_score = lambda record: record['madisonIntelligence'].threatScore
+    
+    critical_threats = []
+    for record in heapq.nlargest(5, critical_records, key=by_score):
+        action_items = record['madisonIntelligence'].actionItems
+        critical_threats.append({
+            **threat_detail(record),
+            'urgentAction': action_items[0]['action'] if action_items else 'Review immediately'
+        })
+    
+    high_threats = [threat_detail(record) for record in heapq.nlargest(5, high_records, key=by_score)]
     
     avg_confidence = round(total_confidence / len(analyzed_records)) if analyzed_records else 0
     
@@ -482,11 +640,26 @@ def generate_executive_summary(analyzed_records: List[Dict]) -> Dict:
         'threatOverview': threat_counts,
         'averageConfidence': avg_confidence,
         'totalRecords': len(analyzed_records),
-        'criticalThreats': critical_threats[:5],
-        'highThreats': high_threats[:5],
+        'criticalThreats': critical_threats,
+        'highThreats': high_threats,
         'executiveSummary': f"Helix Insights analyzed {len(analyzed_records)} competitive records from FDA device approvals and clinical trial databases. Analysis identified {threat_counts['CRITICAL']} CRITICAL threats requiring immediate executive action, {threat_counts['HIGH']} HIGH priority items for strategic competitive review, {threat_counts['MEDIUM']} MEDIUM priority items for ongoing monitoring, and {threat_counts['LOW']} LOW priority items for quarterly review. Average threat assessment confidence level: {avg_confidence}%."
     }
 
+def threat_distribution_chart(threat_counts: tuple):
+    """Plotly bar of (critical, high, medium, low) counts"""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(go.Bar(
+        x=['Critical', 'High', 'Medium', 'Low'],
+        y=list(threat_counts),
+        marker_color=['#dc2626', '#f59e0b', '#fbbf24', '#10b981']
+    ))
+    fig.update_layout(height=300, margin=dict(l=0, r=0, t=10, b=0))
+    return fig
+
+# Rows rendered up front in the results table - the rest sit behind an expander
+TABLE_PREVIEW_ROWS = 100
+
 # Main Application
 def main():
     # Header
@@ -572,9 +745,14 @@ def main():
             else:
                 # Fetch data from APIs
                 search_query = search_term if therapeutic_area == "All Categories" else therapeutic_area.lower()
+                result_limit = 50 if analysis_depth == "Quick Scan" else 200
                 
-                fda_data = fetch_fda_data(search_query, days_back, fda_api_key if fda_api_key else None)
-                clinical_data = fetch_clinical_trials(search_query, days_back)
+                # Both APIs are network-bound and independent, so the trials request and
+                # every FDA page share one pool while this thread collects the FDA pages
+                with script_thread_pool(max_workers=1 + math.ceil(result_limit / fda_page_size(fda_api_key))) as executor:
+                    clinical_future = executor.submit(fetch_clinical_trials, search_query, days_back, result_limit)
+                    fda_data = fetch_fda_data(search_query, days_back, fda_api_key if fda_api_key else None, result_limit, executor)
+                    clinical_data = clinical_future.result()
                 
                 all_records = fda_data + clinical_data
                 
@@ -585,10 +763,10 @@ def main():
                 st.success(f"✅ Retrieved {len(all_records)} records ({len(fda_data)} FDA + {len(clinical_data)} Clinical Trials)")
         
         with st.spinner("Running Madison AI threat analysis..."):
-            # Analyze each record
+            # Analyze all records against a single clock reading
+            analysis_time = datetime.now()
             analyzed_records = []
-            for record in all_records:
-                intelligence = MadisonIntelligenceAgent.analyze_record(record)
+            for record, intelligence in zip(all_records, MadisonIntelligenceAgent.analyze_batch(all_records, analysis_time)):
                 record['madisonIntelligence'] = intelligence
                 analyzed_records.append(record)
             
@@ -616,18 +794,13 @@ def main():
         st.subheader("Threat Distribution")
         
         if PLOTLY_AVAILABLE:
-            fig = go.Figure(data=[go.Pie(
-                labels=['Critical', 'High', 'Medium', 'Low'],
-                values=[
-                    summary['threatOverview']['CRITICAL'],
-                    summary['threatOverview']['HIGH'],
-                    summary['threatOverview']['MEDIUM'],
-                    summary['threatOverview']['LOW']
-                ],
-                marker=dict(colors=['#dc2626', '#f59e0b', '#fbbf24', '#10b981']),
-                hole=0.4
-            )])
-            fig.update_layout(height=400)
+            threat_overview = summary['threatOverview']
+            fig = threat_distribution_chart((
+                threat_overview['CRITICAL'],
+                threat_overview['HIGH'],
+                threat_overview['MEDIUM'],
+                threat_overview['LOW']
+            ))
             st.plotly_chart(fig, use_container_width=True)
         else:
             # Fallback bar chart
@@ -646,74 +819,96 @@ def main():
         st.subheader("Executive Summary")
         st.info(summary['executiveSummary'])
         
-        # Critical Alerts
+        # Critical Alerts - one markdown element per section instead of one per threat
         if summary['criticalThreats']:
             st.subheader("🚨 Critical Threats - Immediate Action Required")
-            for threat in summary['criticalThreats']:
-                st.markdown(f"""
+            st.markdown("".join(f"""
                 <div class="critical-alert">
-                    <strong>{threat['company']}</strong><br>
-                    {threat['product']}<br>
+                    <strong>{escape(threat['company'])}</strong><br>
+                    {escape(threat['product'])}<br>
                     <small>Threat Score: {threat['threatScore']} | Confidence: {threat['confidence']}%</small><br>
-                    <strong>Action:</strong> {threat['urgentAction']}
+                    <strong>Action:</strong> {escape(threat['urgentAction'])}
                 </div>
-                """, unsafe_allow_html=True)
+                """ for threat in summary['criticalThreats']), unsafe_allow_html=True)
         
         # High Priority Items
         if summary['highThreats']:
             st.subheader("⚠️ High Priority Threats")
-            for threat in summary['highThreats']:
-                st.markdown(f"""
+            st.markdown("".join(f"""
                 <div class="high-alert">
-                    <strong>{threat['company']}</strong><br>
-                    {threat['product']}<br>
+                    <strong>{escape(threat['company'])}</strong><br>
+                    {escape(threat['product'])}<br>
                     <small>Threat Score: {threat['threatScore']} | Confidence: {threat['confidence']}%</small>
                 </div>
-                """, unsafe_allow_html=True)
+                """ for threat in summary['highThreats']), unsafe_allow_html=True)
         
         # Detailed Records Table
         st.subheader("📋 Detailed Analysis Results")
         
-        df_records = []
+        # Build the table column-wise so pandas gets one list per column
+        table_columns = {
+            'Company': [], 'Product/Trial': [], 'Source': [], 'Threat Level': [],
+            'Threat Score': [], 'Confidence': [], 'Date': []
+        }
         for record in analyzed_records:
             intel = record['madisonIntelligence']
-            df_records.append({
-                'Company': record.get('company', 'Unknown'),
-                'Product/Trial': (record.get('deviceName') or record.get('trialTitle', 'Unknown'))[:50],
-                'Source': record.get('source', ''),
-                'Threat Level': intel['threatLevel'],
-                'Threat Score': intel['threatScore'],
-                'Confidence': f"{intel['confidence']}%",
-                'Date': record.get('decisionDate') or record.get('startDate', 'N/A')
-            })
-        
-        df = pd.DataFrame(df_records)
-        st.dataframe(df, use_container_width=True, height=400)
+            table_columns['Company'].append(record.get('company', 'Unknown'))
+            table_columns['Product/Trial'].append((record.get('deviceName') or record.get('trialTitle', 'Unknown'))[:50])
+            table_columns['Source'].append(record.get('source', ''))
+            table_columns['Threat Level'].append(intel.threatLevel)
+            table_columns['Threat Score'].append(intel.threatScore)
+            table_columns['Confidence'].append(f"{intel.confidence}%")
+            table_columns['Date'].append(record.get('decisionDate') or record.get('startDate', 'N/A'))
+        
+        # Highest threats first; only the top rows are shipped to the browser unless expanded
+        df = pd.DataFrame(table_columns).sort_values('Threat Score', ascending=False, kind='stable').reset_index(drop=True)
+        st.dataframe(df.head(TABLE_PREVIEW_ROWS), use_container_width=True, height=400)
+        if len(df) > TABLE_PREVIEW_ROWS:
+            with st.expander(f"Show remaining {len(df) - TABLE_PREVIEW_ROWS} records"):
+                st.dataframe(df.iloc[TABLE_PREVIEW_ROWS:], use_container_width=True)
         
         # Download Report
         st.subheader("📥 Export Analysis")
         
-        report_json = json.dumps({
+        report = {
             'summary': summary,
             'detailedRecords': analyzed_records
-        }, indent=2)
+        }
+        # Compact JSON straight to bytes - orjson serializes Intelligence dataclasses natively,
+        # the json fallback converts them via asdict
+        if ORJSON_AVAILABLE:
+            report_json = orjson.dumps(report)
+        else:
+            report_json = json.dumps(report, separators=(',', ':'), ensure_ascii=False, default=asdict).encode('utf-8')
+        file_stem = f"helix_insights_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        st.download_button(
-            label="Download Full Report (JSON)",
-            data=report_json,
-            file_name=f"helix_insights_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
-        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button(
+                label="Download Full Report (JSON)",
+                data=report_json,
+                file_name=f"{file_stem}.json",
+                mime="application/json"
+            )
+        with col2:
+            st.download_button(
+                label="Download Results Table (CSV)",
+                data=df.to_csv(index=False).encode('utf-8'),
+                file_name=f"{file_stem}.csv",
+                mime="text/csv"
+            )
+        if PARQUET_AVAILABLE:
+            with col3:
+                st.download_button(
+                    label="Download Results Table (Parquet)",
+                    data=df.to_parquet(index=False),
+                    file_name=f"{file_stem}.parquet",
+                    mime="application/vnd.apache.parquet"
+                )
     
     # Information Footer
     st.markdown("---")
-    st.markdown("""
-    <div style='text-align: center; color: #6b7280; padding: 2rem;'>
-        <strong>Helix Insights</strong> • Transforming competitive intelligence from hours to seconds<br>
-        Built with Madison AI Framework • Data sources: FDA 510(k) & ClinicalTrials.gov<br>
-        <a href='https://helix-insights.vercel.app' target='_blank'>Learn More →</a>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file